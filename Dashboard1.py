@@ -5,6 +5,8 @@ import dash_bootstrap_components as dbc
 import plotly.express as px
 import pandas as pd
 import logging
+import os
+import threading
 from datetime import datetime
 
 # Configurar logging
@@ -16,6 +18,16 @@ USUARIOS = {
     'usuario1': 'clave456'
 }
 
+# Archivos de datos (organizaciones, subscripciones, órdenes)
+DATA_FILES = (
+    "detail-organizations-2025-04-01.xlsx",
+    "detail-subscription-2025-04-01.xlsx",
+    "detail-order-2025-01-01-to-2025-03-27.xlsx"
+)
+
+# Segmentos del leaderboard por defecto
+SMB_SEGMENTS = ['SMB', 'TOP SMB']
+
 # Inicializar la aplicación Dash
 app = dash.Dash(__name__, 
                 external_stylesheets=[dbc.themes.BOOTSTRAP], 
@@ -127,13 +139,162 @@ def create_time_series_graph(market_orders):
 
     return fig
 
+def create_top_companies_graph(top_companies):
+    """Crea el gráfico de barras con las empresas de mayor monto"""
+    return px.bar(
+        top_companies,
+        x='Organization',
+        y='TCV Item',
+        color='TCV Item',
+        text='TCV Item',
+        labels={'Organization': 'Empresa', 'TCV Item': 'Monto (USD)'},
+        template='plotly_white'
+    ).update_layout(
+        yaxis_title="Monto (USD)",
+        xaxis_title="Empresa",
+        showlegend=False,
+        xaxis={'categoryorder':'total descending'}
+    ).update_traces(
+        texttemplate='$%{y:,.2f}',
+        textposition='outside'
+    )
+
+# =============================================
+# Índice de ranking de empresas
+# =============================================
+
+def build_company_ranking_index(market_orders):
+    """Precalcula el ranking de empresas por segmento (total y por mes) y el índice de filas por organización"""
+    # Clave de mes sin modificar el DataFrame original
+    months = market_orders['Date Creation Order'].dt.strftime('%Y-%m')
+
+    # Totales por organización y segmento para todo el período
+    totals = market_orders.groupby(['Organization', 'segment'])['TCV Item'].sum().reset_index()
+
+    # Totales por organización y segmento para cada mes
+    monthly_totals = (
+        market_orders.assign(month_year=months)
+        .groupby(['month_year', 'Organization', 'segment'])['TCV Item'].sum()
+        .reset_index()
+    )
+
+    # Rankings ordenados de mayor a menor monto; la clave None representa todo el período
+    rankings = {None: {}}
+    for segment, df_seg in totals.groupby('segment'):
+        rankings[None][segment] = (
+            df_seg.sort_values('TCV Item', ascending=False, kind='mergesort')
+            .reset_index(drop=True)
+        )
+    for (month, segment), df_seg in monthly_totals.groupby(['month_year', 'segment']):
+        rankings.setdefault(month, {})[segment] = (
+            df_seg.drop(columns='month_year')
+            .sort_values('TCV Item', ascending=False, kind='mergesort')
+            .reset_index(drop=True)
+        )
+
+    # Copia propia de las órdenes: las posiciones del índice apuntan a este DataFrame
+    market_orders = market_orders.copy()
+
+    # Posiciones de las órdenes de cada organización dentro de market_orders
+    order_offsets = market_orders.groupby('Organization').indices
+
+    return {
+        'rankings': rankings,
+        'order_offsets': order_offsets,
+        'market_orders': market_orders,
+        'segments': sorted(rankings[None]),
+        'periods': sorted(month for month in rankings if month is not None)
+    }
+
+def _ranking_for(ranking_index, segments, period=None):
+    """Devuelve una copia del ranking combinado de uno o varios segmentos para un período"""
+    if isinstance(segments, str):
+        segments = [segments]
+    by_segment = ranking_index['rankings'].get(period, {})
+    frames = [by_segment[segment] for segment in segments if segment in by_segment]
+    if not frames:
+        return pd.DataFrame(columns=['Organization', 'segment', 'TCV Item'])
+    if len(frames) == 1:
+        return frames[0].copy()
+    return (
+        pd.concat(frames, ignore_index=True)
+        .sort_values('TCV Item', ascending=False, kind='mergesort')
+        .reset_index(drop=True)
+    )
+
+def get_top_companies(ranking_index, segments, n=10, period=None):
+    """Devuelve las N empresas con mayor monto para los segmentos y el período indicados"""
+    if isinstance(segments, str):
+        segments = [segments]
+    by_segment = ranking_index['rankings'].get(period, {})
+    # Cada ranking ya está ordenado: basta con combinar las primeras N filas de cada segmento
+    frames = [by_segment[segment].head(n) for segment in segments if segment in by_segment]
+    if not frames:
+        return pd.DataFrame(columns=['Organization', 'segment', 'TCV Item'])
+    return (
+        pd.concat(frames, ignore_index=True)
+        .sort_values('TCV Item', ascending=False, kind='mergesort')
+        .head(n)
+        .reset_index(drop=True)
+    )
+
+def get_ranking_page(ranking_index, segments, page=0, page_size=10, period=None):
+    """Devuelve una página (base 0) del ranking de empresas y el número total de páginas"""
+    if page_size < 1:
+        raise ValueError(f"page_size debe ser mayor o igual a 1: {page_size}")
+    ranking = _ranking_for(ranking_index, segments, period)
+    total_pages = max(1, -(-len(ranking) // page_size))
+    page = min(max(page, 0), total_pages - 1)
+    start = page * page_size
+    ranking.insert(0, 'Posición', range(1, len(ranking) + 1))
+    return ranking.iloc[start:start + page_size], total_pages
+
+def get_company_orders(ranking_index, organization):
+    """Devuelve las órdenes de una empresa usando el índice de filas, sin reagrupar market_orders"""
+    market_orders = ranking_index['market_orders']
+    offsets = ranking_index['order_offsets'].get(organization)
+    if offsets is None:
+        return market_orders.iloc[0:0]
+    return market_orders.iloc[offsets]
+
+# Caché del índice de ranking, invalidada cuando cambian los archivos Excel
+_ranking_cache = {'key': None, 'index': None}
+_ranking_cache_lock = threading.Lock()
+
+def _data_files_key():
+    """Clave de caché basada en la fecha de modificación de los archivos de datos"""
+    return tuple(os.path.getmtime(file_name) for file_name in DATA_FILES)
+
+def get_company_ranking_index(data=None):
+    """Devuelve el índice de ranking en caché; solo se reconstruye si cambian los archivos de datos
+
+    Si se entregan los datos ya cargados, se usa la clave leída antes de esa carga
+    para no guardar datos antiguos bajo la clave de archivos más nuevos.
+    """
+    with _ranking_cache_lock:
+        if data is None:
+            try:
+                key = _data_files_key()
+            except OSError as e:
+                logging.error(f"Error al leer los archivos de datos: {str(e)}")
+                return None
+            if _ranking_cache['key'] == key:
+                return _ranking_cache['index']
+            data = load_and_prepare_data()
+            if not data:
+                return None
+
+        if _ranking_cache['key'] != data['data_files_key']:
+            _ranking_cache['index'] = build_company_ranking_index(data['all_market_orders'])
+            _ranking_cache['key'] = data['data_files_key']
+        return _ranking_cache['index']
+
 def load_and_prepare_data():
     """Carga y prepara los datos para el dashboard"""
     try:
-        # Cargar los archivos Excel 
-        file_name_organizations = "detail-organizations-2025-04-01.xlsx"
-        file_name_subscriptions = "detail-subscription-2025-04-01.xlsx"
-        file_name_orders = "detail-order-2025-01-01-to-2025-03-27.xlsx"
+        # Cargar los archivos Excel (la clave de caché se lee antes de la carga)
+        data_files_key = _data_files_key()
+        file_name_organizations, file_name_subscriptions, file_name_orders = DATA_FILES
         
         df_organizations = pd.read_excel(file_name_organizations, sheet_name="Organizations")
         df_subscriptions = pd.read_excel(file_name_subscriptions)
@@ -212,7 +373,6 @@ def load_and_prepare_data():
             'total_companies': market_orders['Organization'].nunique(),
             'total_amount': market_orders['TCV Item'].sum(),
             'segment_metrics': segment_data.set_index('segment').to_dict('index'),
-            'all_companies': market_orders.groupby(['Organization', 'segment'])['TCV Item'].sum().reset_index().sort_values('TCV Item', ascending=False),
             'renewal_list': market_orders[market_orders['Is Renewal']][['Organization', 'segment', 'Order id', 'TCV Item', 'Date Creation Order']],
             'market_access_list': market_orders[market_orders['Has Marketplace Access']][['Order id', 'Organization', 'segment', 'Order created by', 'TCV Item', 'Product', 'Date Creation Order', 'Has Marketplace Access']].drop_duplicates()
         }
@@ -229,7 +389,8 @@ def load_and_prepare_data():
             'start_date': start_date,
             'end_date': end_date,
             'all_market_orders': market_orders,
-            'df_segment': df_segment
+            'df_segment': df_segment,
+            'data_files_key': data_files_key
         }
         
     except Exception as e:
@@ -256,13 +417,10 @@ def create_marketplace_dashboard(data, df_segment):
         segment_counts.columns = ['Segment', 'Organization Count']
         segment_counts['Percentage'] = segment_counts['Organization Count'] / segment_counts['Organization Count'].sum() * 100
 
-        # Preparar datos para empresas SMB top
-        smb_segments = ['SMB', 'TOP SMB']
-        top_smb_companies = (
-            data['metrics_marketplace']['all_companies']
-            [data['metrics_marketplace']['all_companies']['segment'].isin(smb_segments)]
-            .nlargest(10, 'TCV Item')
-        )
+        # Preparar datos para empresas SMB top desde el índice de ranking en caché
+        company_ranking = get_company_ranking_index(data)
+        smb_segments = [segment for segment in SMB_SEGMENTS if segment in company_ranking['segments']]
+        top_smb_companies = get_top_companies(company_ranking, smb_segments, n=10)
 
         time_series_fig = create_time_series_graph(
             data['all_market_orders']
@@ -364,28 +522,69 @@ def create_marketplace_dashboard(data, df_segment):
                 ))
             ], className="shadow-sm mb-4"))),
 
-            # Fila 6: Top 10 Empresas SMB
+            # Fila 6: Ranking de empresas por segmento y período
             dbc.Row(dbc.Col(dbc.Card([
-                dbc.CardHeader(html.H5("Top 10 Empresas SMB por Monto")),
-                dbc.CardBody(dcc.Graph(
-                    figure=px.bar(
-                        top_smb_companies,
-                        x='Organization',
-                        y='TCV Item',
-                        color='TCV Item',
-                        text='TCV Item',
-                        labels={'Organization': 'Empresa', 'TCV Item': 'Monto (USD)'},
-                        template='plotly_white'
-                    ).update_layout(
-                        yaxis_title="Monto (USD)",
-                        xaxis_title="Empresa",
-                        showlegend=False,
-                        xaxis={'categoryorder':'total descending'}
-                    ).update_traces(
-                        texttemplate='$%{y:,.2f}',
-                        textposition='outside'
+                dbc.CardHeader(html.H5("Top Empresas por Monto")),
+                dbc.CardBody([
+                    dbc.Row([
+                        dbc.Col([
+                            html.Label("Segmentos"),
+                            dcc.Dropdown(
+                                id='ranking-segment',
+                                options=[{'label': segment, 'value': segment} for segment in company_ranking['segments']],
+                                value=smb_segments,
+                                multi=True
+                            )
+                        ], md=6),
+                        dbc.Col([
+                            html.Label("Período"),
+                            dcc.Dropdown(
+                                id='ranking-period',
+                                options=[{'label': 'Todo el período', 'value': 'all'}] +
+                                        [{'label': period, 'value': period} for period in company_ranking['periods']],
+                                value='all',
+                                clearable=False
+                            )
+                        ], md=4),
+                        dbc.Col([
+                            html.Label("Top N"),
+                            dbc.Input(id='ranking-top-n', type='number', min=1, step=1, value=10)
+                        ], md=2)
+                    ], className="mb-3"),
+                    dcc.Graph(id='ranking-top-graph', figure=create_top_companies_graph(top_smb_companies)),
+                    html.H6("Ranking completo (seleccione una empresa para ver sus órdenes)", className="mt-3"),
+                    dash_table.DataTable(
+                        id='ranking-table',
+                        columns=[
+                            {"name": "Posición", "id": "Posición"},
+                            {"name": "Empresa", "id": "Organization"},
+                            {"name": "Segmento", "id": "segment"},
+                            {"name": "Monto", "id": "TCV Item", "type": "numeric", "format": {"specifier": "$,.2f"}}
+                        ],
+                        page_action='custom',
+                        page_current=0,
+                        page_size=10,
+                        style_table={'overflowX': 'auto'},
+                        style_cell={'textAlign': 'left'},
+                        style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'}
+                    ),
+                    html.H6(id='ranking-orders-title', className="mt-3"),
+                    dash_table.DataTable(
+                        id='ranking-orders',
+                        columns=[
+                            {"name": "Orden ID", "id": "Order id"},
+                            {"name": "Producto", "id": "Product"},
+                            {"name": "Monto", "id": "TCV Item", "type": "numeric", "format": {"specifier": "$,.2f"}},
+                            {"name": "Fecha", "id": "Date Creation Order"},
+                            {"name": "Creada por", "id": "Order created by"}
+                        ],
+                        page_size=10,
+                        style_table={'overflowX': 'auto'},
+                        style_cell={'textAlign': 'left'},
+                        style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'},
+                        sort_action="native"
                     )
-                ))
+                ])
             ], className="shadow-sm mb-4"))),
 
             # Fila 7: Gráfica de ventas en el tiempo
@@ -672,6 +871,61 @@ def descargar_resumen(n_clicks):
     return dcc.send_data_frame(data['resumen_owner_pais'].to_excel, 
                              "resumen_owner_pais.xlsx", index=False)
 
+# Callbacks del ranking de empresas
+def _ranking_period(period):
+    return None if period in (None, 'all') else period
+
+@app.callback(
+    Output('ranking-top-graph', 'figure'),
+    [Input('ranking-segment', 'value'),
+     Input('ranking-period', 'value'),
+     Input('ranking-top-n', 'value')],
+    prevent_initial_call=True
+)
+def update_ranking_top(segments, period, top_n):
+    company_ranking = get_company_ranking_index()
+    if company_ranking is None or not segments or not top_n or top_n < 1:
+        return dash.no_update
+    top_companies = get_top_companies(company_ranking, segments, n=int(top_n), period=_ranking_period(period))
+    return create_top_companies_graph(top_companies)
+
+@app.callback(
+    [Output('ranking-table', 'data'),
+     Output('ranking-table', 'page_count'),
+     Output('ranking-table', 'active_cell'),
+     Output('ranking-table', 'selected_cells')],
+    [Input('ranking-segment', 'value'),
+     Input('ranking-period', 'value'),
+     Input('ranking-table', 'page_current'),
+     Input('ranking-table', 'page_size')]
+)
+def update_ranking_table(segments, period, page_current, page_size):
+    # Al cambiar segmento, período o página se limpia la celda activa, lo que también vacía el detalle
+    company_ranking = get_company_ranking_index()
+    if company_ranking is None or not segments:
+        return [], 1, None, []
+    page, total_pages = get_ranking_page(
+        company_ranking, segments, page=page_current or 0, page_size=page_size or 10,
+        period=_ranking_period(period)
+    )
+    return page.to_dict('records'), total_pages, None, []
+
+@app.callback(
+    [Output('ranking-orders', 'data'),
+     Output('ranking-orders-title', 'children')],
+    Input('ranking-table', 'active_cell'),
+    State('ranking-table', 'data'),
+    prevent_initial_call=True
+)
+def update_ranking_orders(active_cell, table_data):
+    company_ranking = get_company_ranking_index()
+    if company_ranking is None or not active_cell or not table_data or active_cell['row'] >= len(table_data):
+        return [], ""
+    organization = table_data[active_cell['row']]['Organization']
+    orders = get_company_orders(company_ranking, organization)
+    orders = orders[['Order id', 'Product', 'TCV Item', 'Date Creation Order', 'Order created by']]
+    return orders.to_dict('records'), f"Órdenes de {organization}"
+
 # =============================================
 # Ejecutar la aplicación
 # =============================================
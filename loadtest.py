@@ -0,0 +1,482 @@
+"""Prueba de carga del dashboard con usuarios concurrentes simulados.
+
+Levanta el servidor con gunicorn sobre datos sintéticos y ejecuta sesiones de
+usuario contra los endpoints reales de Dash (_dash-update-component) para cada
+combinación de workers y threads. Reporta throughput, latencias p50/p95/p99 y
+memoria de los workers.
+
+Uso:
+    python loadtest.py --workers 1,2,4 --threads 1,4 --users 10 --duration 30
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+
+# Directorio del proyecto (donde está Dashboard1.py)
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Nombres de archivo que espera load_and_prepare_data
+FILE_ORGANIZATIONS = "detail-organizations-2025-04-01.xlsx"
+FILE_SUBSCRIPTIONS = "detail-subscription-2025-04-01.xlsx"
+FILE_ORDERS = "detail-order-2025-01-01-to-2025-03-27.xlsx"
+
+# Texto que solo aparece en el dashboard renderizado correctamente
+DASHBOARD_MARKER = "Panel de Control Integral"
+
+# Errores de red, HTTP o de decodificación que cuentan como fallo de un paso.
+# Cualquier otra excepción es un error del propio harness y se reporta a nivel de sesión.
+STEP_ERRORS = (urllib.error.URLError, http.client.HTTPException, ConnectionError,
+               socket.timeout, json.JSONDecodeError)
+
+# Segmentos y período usados en los pasos del ranking (existen en los datos sintéticos)
+RANKING_SEGMENTS = ['SMB', 'TOP SMB']
+RANKING_FILTER_SEGMENTS = ['SMB', 'TOP SMB', 'Enterprise', 'Mid Market']
+RANKING_FILTER_PERIOD = '2025-02'
+
+# Credenciales de prueba (deben existir en USUARIOS)
+LOGIN_USER = 'admin'
+LOGIN_PASSWORD = 'password123'
+
+# =============================================
+# Generación de datos sintéticos
+# =============================================
+
+def generate_synthetic_data(target_dir, n_organizations=300, n_orders=2000, n_subscriptions=500, seed=42):
+    """Genera los archivos Excel de organizaciones, subscripciones y órdenes con datos sintéticos"""
+    rng = np.random.default_rng(seed)
+
+    # Organizaciones (la primera hoja debe llamarse "Organizations")
+    names = [f"Empresa {i:04d}" for i in range(n_organizations)]
+    segments = rng.choice(['SMB', 'TOP SMB', 'Enterprise', 'Mid Market', None], size=n_organizations)
+    df_organizations = pd.DataFrame({
+        'name': names,
+        'status': rng.choice(['active', 'pending', 'suspended'], size=n_organizations, p=[0.7, 0.2, 0.1]),
+        'owner': rng.choice([f"owner{i}@orion.global" for i in range(8)], size=n_organizations),
+        'country': rng.choice(['Chile', 'Argentina', 'Perú', 'Colombia', 'México'], size=n_organizations),
+        'segment': segments
+    })
+
+    # Subscripciones
+    df_subscriptions = pd.DataFrame({
+        'status': rng.choice(['active', 'inactive'], size=n_subscriptions, p=[0.8, 0.2]),
+        'company': [name if has_company else None
+                    for name, has_company in zip(rng.choice(names, size=n_subscriptions),
+                                                 rng.random(n_subscriptions) < 0.5)],
+        'console_domain': rng.choice([f"dominio{i}.com" for i in range(10)], size=n_subscriptions),
+        'product': rng.choice(['Producto A', 'Producto B', 'Producto C'], size=n_subscriptions)
+    })
+
+    # Órdenes dentro del período analizado
+    start = datetime(2025, 1, 1)
+    dates = [start + timedelta(days=int(d)) for d in rng.integers(0, 83, size=n_orders)]
+    organizations = rng.choice(names, size=n_orders)
+    df_orders = pd.DataFrame({
+        'Order id': [f"ORD-{i:06d}" for i in range(n_orders)],
+        'Organization': organizations,
+        'Date Creation Order': [d.strftime('%d-%m-%Y') for d in dates],
+        'TCV Item': [f"{amount:.2f}" for amount in rng.gamma(2.0, 500.0, size=n_orders)],
+        'Order created by': ["ventas@orion.global" if hub else f"compras@{org.split()[-1]}.com"
+                             for hub, org in zip(rng.random(n_orders) < 0.3, organizations)],
+        'Order item type': rng.choice(['new', 'renewal'], size=n_orders, p=[0.7, 0.3]),
+        'Product': rng.choice(['Producto A', 'Producto B', 'Producto C'], size=n_orders)
+    })
+
+    with pd.ExcelWriter(os.path.join(target_dir, FILE_ORGANIZATIONS)) as writer:
+        df_organizations.to_excel(writer, sheet_name="Organizations", index=False)
+    df_subscriptions.to_excel(os.path.join(target_dir, FILE_SUBSCRIPTIONS), index=False)
+    df_orders.to_excel(os.path.join(target_dir, FILE_ORDERS), index=False)
+
+# =============================================
+# Servidor local
+# =============================================
+
+def _free_port():
+    """Obtiene un puerto TCP libre en localhost"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(data_dir, workers, threads, port, timeout=60):
+    """Inicia gunicorn con los datos sintéticos y espera a que responda"""
+    cmd = [
+        sys.executable, '-m', 'gunicorn', 'Dashboard1:server',
+        '--bind', f"127.0.0.1:{port}",
+        '--workers', str(workers),
+        '--threads', str(threads),
+        '--chdir', data_dir,
+        '--pythonpath', PROJECT_DIR,
+        '--timeout', '120',
+        '--log-level', 'warning'
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó con código {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/_dash-dependencies", timeout=2) as response:
+                if response.status == 200:
+                    return process, base_url
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.2)
+
+    stop_server(process)
+    raise RuntimeError(f"El servidor no respondió en {timeout} segundos")
+
+def stop_server(process):
+    """Detiene gunicorn y sus workers"""
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def worker_memory_mb(master_pid):
+    """Devuelve la memoria residente (MB) de cada worker de gunicorn, leyendo /proc"""
+    memory = {}
+    if not os.path.isdir('/proc'):
+        return memory
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # El campo 4 es el PID del proceso padre (el nombre puede contener espacios)
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            if ppid != master_pid:
+                continue
+            with open(f"/proc/{entry}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        memory[int(entry)] = int(line.split()[1]) / 1024
+                        break
+        except (OSError, ValueError, IndexError):
+            continue
+    return memory
+
+# =============================================
+# Cliente de callbacks de Dash
+# =============================================
+
+def _split_callback_id(callback_id):
+    """Separa el identificador de salida de un callback en sus pares id/propiedad"""
+    if callback_id.startswith('..'):
+        return [_split_callback_id(part) for part in callback_id[2:-2].split('...')]
+    component_id, prop = callback_id.rsplit('.', 1)
+    return {'id': component_id, 'property': prop}
+
+class DashClient:
+    """Cliente HTTP mínimo que invoca callbacks de Dash como lo haría el navegador"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        with urllib.request.urlopen(f"{base_url}/_dash-dependencies", timeout=10) as response:
+            self.dependencies = json.loads(response.read())
+
+    def _find_callback(self, output, trigger):
+        """Busca el callback que escribe `output` y es disparado por `trigger`
+
+        Una misma entrada puede disparar varios callbacks (p. ej. ranking-segment.value)
+        y una misma salida puede tener varios callbacks con allow_duplicate
+        (login-state.data), por lo que se exige que coincidan ambos.
+        """
+        matches = []
+        for dep in self.dependencies:
+            outputs = _split_callback_id(dep['output'])
+            outputs = outputs if isinstance(outputs, list) else [outputs]
+            output_ids = {f"{spec['id']}.{spec['property'].split('@')[0]}" for spec in outputs}
+            input_ids = {f"{spec['id']}.{spec['property']}" for spec in dep['inputs']}
+            if output in output_ids and trigger in input_ids:
+                matches.append(dep)
+        if len(matches) != 1:
+            raise LookupError(f"Se esperaba un callback para {output} disparado por {trigger}, hay {len(matches)}")
+        return matches[0]
+
+    def get(self, path):
+        """Realiza un GET y devuelve el cuerpo JSON de la respuesta"""
+        with urllib.request.urlopen(f"{self.base_url}{path}", timeout=120) as response:
+            return json.loads(response.read())
+
+    def callback(self, output, trigger, input_values, state_values=None):
+        """Invoca el callback de `output` disparado por `trigger` y devuelve sus salidas como {id: {propiedad: valor}}
+
+        Devuelve un diccionario vacío si el callback no actualiza nada (HTTP 204).
+        """
+        dep = self._find_callback(output, trigger)
+        payload = {
+            'output': dep['output'],
+            'outputs': _split_callback_id(dep['output']),
+            'inputs': [dict(spec, value=input_values.get(f"{spec['id']}.{spec['property']}"))
+                       for spec in dep['inputs']],
+            'state': [dict(spec, value=(state_values or {}).get(f"{spec['id']}.{spec['property']}"))
+                      for spec in dep.get('state', [])],
+            'changedPropIds': [trigger]
+        }
+        request = urllib.request.Request(
+            f"{self.base_url}/_dash-update-component",
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request, timeout=120) as response:
+            body = response.read()
+            if response.status == 204:
+                return {}
+            return json.loads(body)['response']
+
+def _output(outputs, component_id, prop):
+    """Obtiene el valor de una salida (o None si no viene), aceptando propiedades con sufijo de allow_duplicate"""
+    for key, value in outputs.get(component_id, {}).items():
+        if key == prop or key.startswith(f"{prop}@"):
+            return value
+    return None
+
+def _ranking_inputs(segments, period, top_n=10, page_current=0, page_size=10):
+    """Valores de entrada de los callbacks del ranking"""
+    return {
+        'ranking-segment.value': segments,
+        'ranking-period.value': period,
+        'ranking-top-n.value': top_n,
+        'ranking-table.page_current': page_current,
+        'ranking-table.page_size': page_size
+    }
+
+def _valid_ranking_page(rows, first_position):
+    """Verifica que una página del ranking traiga filas que comienzan en la posición esperada"""
+    return bool(rows) and rows[0].get('Posición') == first_position and all('Organization' in row for row in rows)
+
+def user_session(client, session_number):
+    """Ejecuta una sesión de usuario y devuelve una lista de (paso, latencia en segundos, éxito)
+
+    Recorre la carga inicial, el login, el render del dashboard, los callbacks del
+    ranking de la pestaña Marketplace (página inicial, cambio de filtros, cambio de
+    página y detalle de una empresa) y una de las descargas (rotando entre las tres).
+    El resto de las pestañas cambia en el navegador sin callbacks.
+    """
+    downloads = [('btn-descargar-empresas', 'descargar-empresas'),
+                 ('btn-descargar-subscripciones', 'descargar-subscripciones'),
+                 ('btn-descargar-resumen', 'descargar-resumen')]
+    button, download = downloads[session_number % len(downloads)]
+    session = {'username': LOGIN_USER}
+    results = []
+
+    def run_step(name, step):
+        # El paso devuelve True solo si la respuesta tiene el contenido esperado,
+        # no basta con un HTTP 200 (display_page responde 200 incluso si falla la carga de datos)
+        start = time.perf_counter()
+        try:
+            ok = step()
+        except STEP_ERRORS as e:
+            logging.warning(f"Paso {name} falló: {e!r}")
+            ok = False
+        results.append((name, time.perf_counter() - start, ok))
+        return ok
+
+    run_step('layout', lambda: 'page-content' in json.dumps(client.get('/_dash-layout')))
+    run_step('render-login', lambda: 'login-button' in json.dumps(_output(client.callback(
+        'page-content.children', 'url.pathname',
+        {'url.pathname': '/', 'login-state.data': None}), 'page-content', 'children')))
+    run_step('login', lambda: _output(client.callback(
+        'login-state.data', 'login-button.n_clicks', {'login-button.n_clicks': 1},
+        {'input-username.value': LOGIN_USER, 'input-password.value': LOGIN_PASSWORD}
+    ), 'login-state', 'data') == session)
+    run_step('render-dashboard', lambda: DASHBOARD_MARKER in json.dumps(_output(client.callback(
+        'page-content.children', 'login-state.data',
+        {'url.pathname': '/', 'login-state.data': session}), 'page-content', 'children'),
+        ensure_ascii=False))
+
+    # Ranking: el navegador pide la primera página apenas se renderiza el dashboard
+    page = {}
+
+    def ranking_page(trigger, inputs, first_position):
+        page['rows'] = _output(client.callback('ranking-table.data', trigger, inputs), 'ranking-table', 'data')
+        return _valid_ranking_page(page['rows'], first_position)
+
+    run_step('ranking-page', lambda: ranking_page(
+        'ranking-table.page_current', _ranking_inputs(RANKING_SEGMENTS, 'all'), 1))
+
+    # Cambio de segmentos, período y top N: se disparan el gráfico y la tabla
+    filter_inputs = _ranking_inputs(RANKING_FILTER_SEGMENTS, RANKING_FILTER_PERIOD, top_n=5)
+    run_step('ranking-filter-top', lambda: bool((_output(client.callback(
+        'ranking-top-graph.figure', 'ranking-period.value', filter_inputs),
+        'ranking-top-graph', 'figure') or {}).get('data')))
+    run_step('ranking-filter-table', lambda: ranking_page(
+        'ranking-period.value', filter_inputs, 1))
+
+    # Cambio de página
+    page_inputs = dict(filter_inputs, **{'ranking-table.page_current': 1})
+    run_step('ranking-page-change', lambda: ranking_page(
+        'ranking-table.page_current', page_inputs, 11))
+
+    # Detalle de la primera empresa de la página devuelta
+    def drill_down():
+        rows = page.get('rows')
+        if not rows:
+            return False
+        organization = rows[0]['Organization']
+        outputs = client.callback(
+            'ranking-orders.data', 'ranking-table.active_cell',
+            {'ranking-table.active_cell': {'row': 0, 'column': 1, 'column_id': 'Organization'}},
+            {'ranking-table.data': rows}
+        )
+        orders = _output(outputs, 'ranking-orders', 'data')
+        return bool(orders) and _output(outputs, 'ranking-orders-title', 'children') == f"Órdenes de {organization}"
+
+    run_step('ranking-drilldown', drill_down)
+
+    run_step('download', lambda: bool((_output(client.callback(
+        f"{download}.data", f"{button}.n_clicks", {f"{button}.n_clicks": 1}),
+        download, 'data') or {}).get('content')))
+    return results
+
+# =============================================
+# Ejecución y reporte
+# =============================================
+
+def _percentile(sorted_values, q):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, int(np.ceil(q / 100 * len(sorted_values))) - 1)
+    return sorted_values[rank]
+
+def run_scenario(data_dir, workers, threads, users, duration):
+    """Mide una combinación de workers/threads con `users` usuarios concurrentes durante `duration` segundos"""
+    process, base_url = start_server(data_dir, workers, threads, _free_port())
+    try:
+        client = DashClient(base_url)
+        results = []
+        lock = threading.Lock()
+        peak_memory = {}
+        stop = threading.Event()
+
+        def sample_memory():
+            while not stop.is_set():
+                for pid, mb in worker_memory_mb(process.pid).items():
+                    peak_memory[pid] = max(peak_memory.get(pid, 0.0), mb)
+                stop.wait(0.5)
+
+        def simulate_user(user_number):
+            session_number = user_number
+            while time.time() < deadline:
+                try:
+                    session_results = user_session(client, session_number)
+                except Exception as e:
+                    # Un error inesperado no debe terminar el hilo en silencio: se cuenta como fallo
+                    logging.error(f"Error en la sesión del usuario {user_number}: {e!r}")
+                    session_results = [('session', 0.0, False)]
+                with lock:
+                    results.extend(session_results)
+                session_number += users
+
+        sampler = threading.Thread(target=sample_memory, daemon=True)
+        sampler.start()
+
+        start = time.perf_counter()
+        deadline = time.time() + duration
+        user_threads = [threading.Thread(target=simulate_user, args=(i,)) for i in range(users)]
+        for thread in user_threads:
+            thread.start()
+        for thread in user_threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        sampler.join()
+    finally:
+        stop_server(process)
+
+    latencies = sorted(latency for _, latency, ok in results if ok)
+    errors = sum(1 for _, _, ok in results if not ok)
+    by_step = {}
+    for name, latency, ok in results:
+        if ok:
+            by_step.setdefault(name, []).append(latency)
+
+    return {
+        'workers': workers,
+        'threads': threads,
+        'users': users,
+        'requests': len(results),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': _percentile(latencies, 50) * 1000,
+        'p95_ms': _percentile(latencies, 95) * 1000,
+        'p99_ms': _percentile(latencies, 99) * 1000,
+        'step_p95_ms': {name: _percentile(sorted(values), 95) * 1000 for name, values in by_step.items()},
+        'worker_memory_max_mb': max(peak_memory.values(), default=0.0),
+        'worker_memory_total_mb': sum(peak_memory.values())
+    }
+
+def print_report(summaries):
+    """Imprime una tabla con los resultados de cada escenario"""
+    header = (f"{'workers':>7} {'threads':>7} {'users':>5} {'req':>6} {'err':>4} {'req/s':>8} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mem max MB':>10} {'mem tot MB':>10}")
+    print(header)
+    print('-' * len(header))
+    for s in summaries:
+        print(f"{s['workers']:>7} {s['threads']:>7} {s['users']:>5} {s['requests']:>6} {s['errors']:>4} "
+              f"{s['throughput']:>8.2f} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} "
+              f"{s['worker_memory_max_mb']:>10.1f} {s['worker_memory_total_mb']:>10.1f}")
+    print()
+    for s in summaries:
+        steps = ', '.join(f"{name} {p95:.1f}" for name, p95 in sorted(s['step_p95_ms'].items()))
+        print(f"p95 por paso (ms) [{s['workers']}w/{s['threads']}t]: {steps}")
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del dashboard con usuarios concurrentes")
+    parser.add_argument('--workers', type=_int_list, default=[1, 2], help="Lista de workers de gunicorn, ej. 1,2,4")
+    parser.add_argument('--threads', type=_int_list, default=[1], help="Lista de threads por worker, ej. 1,4")
+    parser.add_argument('--users', type=int, default=5, help="Usuarios concurrentes simulados")
+    parser.add_argument('--duration', type=float, default=20, help="Duración de cada escenario en segundos")
+    parser.add_argument('--orders', type=int, default=2000, help="Órdenes sintéticas a generar")
+    parser.add_argument('--organizations', type=int, default=300, help="Organizaciones sintéticas a generar")
+    parser.add_argument('--json', dest='json_path', help="Guardar los resultados en un archivo JSON")
+    parser.add_argument('--max-p95', type=float, help="Falla (código 1) si algún escenario supera este p95 en ms")
+    args = parser.parse_args(argv)
+
+    summaries = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        logging.info(f"Generando datos sintéticos en {data_dir}")
+        generate_synthetic_data(data_dir, n_organizations=args.organizations, n_orders=args.orders)
+
+        for workers in args.workers:
+            for threads in args.threads:
+                logging.info(f"Escenario: {workers} workers, {threads} threads, {args.users} usuarios")
+                summaries.append(run_scenario(data_dir, workers, threads, args.users, args.duration))
+
+    print_report(summaries)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(summaries, f, indent=2)
+
+    failed = any(s['errors'] for s in summaries)
+    if args.max_p95 is not None:
+        failed = failed or any(s['p95_ms'] > args.max_p95 for s in summaries)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())